@@ -5,12 +5,14 @@ An example where computing with a ZDD can be faster.
 """
 
 from xcover import covers, covers_zdd
-from xcover.zdd_utils import to_setset, count_setset_nodes
-from itertools import combinations
+from xcover.zdd_utils import to_setset, count_setset_nodes, count_zdd
 from scipy.special import factorial2
+import numpy as np
 
 n = 16
-options = list(combinations(range(n), 2))
+# each option is an edge (i, j) of K_n, one per row of an integer array
+i, j = np.triu_indices(n, k=1)
+options = np.stack([i, j], axis=1)
 
 # Show the expected answer (n-1)!!
 print("Expected solution count:", factorial2(n - 1, exact=True) if not n % 2 else 0)
@@ -22,9 +24,9 @@ def solve_covers():
 
 def solve_covers_zdd():
     n_options = len(options)
-    zdd = covers_zdd(options, use_memo_cache=True, choose_heuristic="leftmost")
+    zdd = list(covers_zdd(options, use_memo_cache=True, choose_heuristic="leftmost"))
+    print("covers_zdd solution count:", count_zdd(zdd))
     ss = to_setset(zdd, n_options)
-    print("covers_zdd solution count:", ss.len())
     print("covers_zdd node count:", count_setset_nodes(ss))
 
 
@@ -1,7 +1,7 @@
 """Routines for MacMahon's triangular edge-matching puzzles"""
 
 from itertools import product
-from shapely import Polygon, Point
+from shapely import Polygon, contains_xy
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -73,27 +73,36 @@ def macmahon_mesh(boundary_word, initial_cell=[0, 0]):
     y = vertices[:, 1]
     poly = Polygon(shell=vertices)
 
-    cells = []
-    for i in range(min(x), max(x) + 1):
-        for j in range(min(y), max(y) + 1):
-            if poly.contains(Point([i + 1 / 3, j + 1 / 3])):
-                # "normal" triangle
-                cells.append((i, j, False))
-            if poly.contains(Point([i + 2 / 3, j + 2 / 3])):
-                # upside-down triangle
-                cells.append((i, j, True))
+    i, j = np.meshgrid(
+        np.arange(min(x), max(x) + 1), np.arange(min(y), max(y) + 1), indexing="ij"
+    )
+    # test the centres of all the "normal" triangles and of all the
+    # upside-down triangles in the bounding box in one call each
+    inside = np.stack(
+        [
+            contains_xy(poly, i + 1 / 3, j + 1 / 3),
+            contains_xy(poly, i + 2 / 3, j + 2 / 3),
+        ],
+        axis=-1,
+    )
+    cells = [
+        (int(i[a, b]), int(j[a, b]), bool(orient))
+        for a, b, orient in np.argwhere(inside)
+    ]
 
     return cells, boundary_edges
 
 
 def macmahon_pieces():
     """The 24 unique triangular tiles with a choice of four colours."""
+    seen = set()
     ts = []
     for x in product(["a", "b", "c", "d"], repeat=3):
-        s1 = (x[1], x[2], x[0])
-        s2 = (x[2], x[0], x[1])
-        if x not in ts and s1 not in ts and s2 not in ts:
-            ts.append(x)  # only include is not cyclically the same as what have
+        # represent each piece by the lexicographically smallest rotation
+        canon = min(x, (x[1], x[2], x[0]), (x[2], x[0], x[1]))
+        if canon not in seen:
+            seen.add(canon)
+            ts.append(canon)  # only include if not cyclically the same
     return ts
 
 
@@ -1,7 +1,10 @@
-from xcover import covers, covers_zdd, covers_bool, covers_bool_zdd
-from xcover.utils import verify_exact_cover
+from xcover import covers, covers_zdd, covers_bool, covers_bool_zdd, CompiledSolver
+from xcover import algorithm_c_parallel
+from xcover.solvers import input_as_arrays
+from xcover.utils import verify_exact_cover, bool_array_to_options
 from xcover.io import read_xcover_from_file
-from xcover.zdd_utils import to_zdd_algorithms
+from xcover.zdd_utils import to_zdd_algorithms, count_zdd, reduce_zdd
+from xcover.zdd_utils import to_setset, to_oxidd, zdd_arrays
 import numpy as np
 import pytest
 import sys
@@ -58,6 +61,70 @@ def test_bool_solve():
     s2 = set([frozenset(s) for s in true_sols])
     assert s1 == s2
 
+    sparse = pytest.importorskip("scipy.sparse")
+    for matrix in [sparse.csr_matrix(to_cover), sparse.coo_matrix(to_cover)]:
+        assert set([frozenset(s) for s in covers_bool(matrix)]) == s2
+        assert count_zdd(covers_bool_zdd(matrix)) == 2
+
+
+def test_bool_density(monkeypatch):
+    import xcover.solvers
+
+    # the bitset solver is only used for dense enough matrices
+    used = []
+
+    def recording(name):
+        solver = getattr(xcover.solvers, name)
+
+        def wrapped(*args):
+            used.append(name)
+            return solver(*args)
+
+        return wrapped
+
+    for name in ["algorithm_c", "algorithm_c_bitset"]:
+        monkeypatch.setattr(xcover.solvers, name, recording(name))
+
+    dense = np.array([[1, 1, 0], [0, 0, 1], [1, 0, 0], [0, 1, 1]], dtype=bool)
+    assert {frozenset(s) for s in covers_bool(dense)} == {
+        frozenset([0, 1]),
+        frozenset([2, 3]),
+    }
+    assert used == ["algorithm_c_bitset"]
+
+    sparse = np.eye(500, dtype=bool)
+    assert [sorted(s) for s in covers_bool(sparse)] == [list(range(500))]
+    assert used == ["algorithm_c_bitset", "algorithm_c"]
+
+
+def test_bool_sparse_large(monkeypatch):
+    sparse = pytest.importorskip("scipy.sparse")
+    import xcover.solvers
+
+    # a large, very sparse matrix must not be packed into dense bitsets
+    def no_bitsets(matrix):
+        raise AssertionError("sparse input packed into bitsets")
+
+    monkeypatch.setattr(xcover.solvers, "bool_as_bitsets", no_bitsets)
+    n = 30000
+    sols = list(covers_bool(sparse.identity(n, dtype=bool, format="csr")))
+    assert len(sols) == 1
+    assert sorted(sols[0]) == list(range(n))
+
+
+def test_bool_array_to_options():
+    matrix = np.array(
+        [
+            [1, 0, 0, 1],
+            [0, 0, 0, 0],
+            [0, 1, 1, 1],
+            [1, 0, 0, 0],
+        ],
+        dtype=bool,
+    )
+    assert bool_array_to_options(matrix) == [[0, 3], [], [1, 2, 3], [0]]
+    assert [set(s) for s in covers(bool_array_to_options(matrix))] == [{2, 3}]
+
 
 def test_simple_secondary():
     primary = ["a", "b", "c", "d", "e", "f", "g"]
@@ -86,6 +153,29 @@ def test_simple_secondary():
     assert s1 == s2
 
 
+def test_compiled_solver():
+    options = [
+        ["a", "d"],
+        ["b", "c"],
+        ["a", "b", "e"],
+        ["c", "d"],
+        ["e"],
+        ["b", "e"],
+        ["c"],
+    ]
+    solver = CompiledSolver(options)
+
+    for secondary in [None, ["e"], None]:
+        sols = list(solver.covers(secondary=secondary))
+        [verify_exact_cover(s, solver, secondary=secondary) for s in sols]
+        assert {frozenset(s) for s in sols} == {
+            frozenset(s) for s in covers(options, secondary=secondary)
+        }
+    assert len(sols) == 3
+    assert len(list(solver.covers(primary=["a", "b"]))) == 3
+    assert count_zdd(solver.covers_zdd(primary=["a", "b"])) == 3
+
+
 def test_simple_colored():
     primary = ["p", "q", "r"]
     secondary = ["x", "y"]
@@ -134,6 +224,79 @@ def test_simple_colored2():
     assert len(sols) == 5
 
 
+def test_verify_rejects():
+    primary = ["a", "b", "c"]
+    secondary = ["d"]
+    options = [["a", "b", "d:BLUE"], ["c", "d:BLUE"], ["c", "d:RED"], ["b", "c"]]
+    kw = dict(primary=primary, secondary=secondary, colored=True)
+
+    verify_exact_cover([0, 1], options, **kw)
+    for bad in [[0, 2], [0, 1, 3], [0]]:
+        with pytest.raises(AssertionError):
+            verify_exact_cover(bad, options, **kw)
+
+    # an item outside the given primary and secondary items
+    with pytest.raises(ValueError):
+        verify_exact_cover([0, 4], options + [["c", "e"]], **kw)
+
+
+def test_colored_zdd():
+    primary = ["p%d" % i for i in range(7)]
+    secondary = ["s"]
+    options = [
+        ["p1", "p5", "p2"],
+        ["p2", "s"],
+        ["p1"],
+        ["p3", "p0"],
+        ["p6"],
+        ["p3"],
+        ["p6"],
+        ["p0", "p2"],
+        ["p0", "s:A"],
+        ["p5", "p3"],
+        ["p1", "p6", "p4"],
+        ["p2", "p4"],
+        ["p3", "p6", "p2"],
+        ["p4", "s:A"],
+        ["p6", "p5", "s:C"],
+        ["p6", "s:C"],
+        ["p5", "s"],
+        ["p1", "p0", "s:A"],
+        ["p0", "p3"],
+    ]
+
+    sols = list(covers(options, primary=primary, secondary=secondary, colored=True))
+    for use_memo_cache in [False, True]:
+        zdd = covers_zdd(
+            options,
+            primary=primary,
+            secondary=secondary,
+            colored=True,
+            use_memo_cache=use_memo_cache,
+        )
+        assert count_zdd(zdd) == len(sols) == 20
+
+
+def test_zdd_conversions():
+    from zdd_algorithms import to_set_of_sets
+
+    i, j = np.triu_indices(6, k=1)
+    options = np.stack([i, j], axis=1)
+    sols = {frozenset(s) for s in covers(options)}
+    zdd = list(covers_zdd(options))
+
+    # the conversions take both the yielded nodes and their column form
+    for nodes in [zdd, zdd_arrays(zdd)]:
+        assert count_zdd(nodes) == count_zdd(reduce_zdd(nodes)) == len(sols) == 15
+        assert {frozenset(s) for s in to_set_of_sets(to_zdd_algorithms(nodes))} == sols
+
+        pytest.importorskip("graphillion")
+        assert {frozenset(s) for s in to_setset(nodes, len(options))} == sols
+
+        pytest.importorskip("oxidd")
+        assert to_oxidd(nodes, len(options)).sat_count(len(options)) == len(sols)
+
+
 def test_n_queens():
     n = 8
     options = [
@@ -154,6 +317,42 @@ def test_n_queens():
 
     assert n_sols == 92
 
+    sols = algorithm_c_parallel(*input_as_arrays(options, secondary=secondary))
+    assert len(sols) == 92
+    [verify_exact_cover(s, options, secondary=secondary) for s in sols]
+
+    # no options and no primary items, solved by the empty cover
+    empty = np.zeros(0, dtype=np.uint32)
+    ptr = np.zeros(1, dtype=np.uint32)
+    sols = algorithm_c_parallel(empty, ptr, empty, 0, 0)
+    assert [list(s) for s in sols] == [[]]
+
+
+def test_int_array_options():
+    from itertools import combinations
+
+    n = 8
+    options = list(combinations(range(n), 2))
+    i, j = np.triu_indices(n, k=1)
+    options_array = np.stack([i, j], axis=1)
+
+    sols = list(covers(options_array))
+    [verify_exact_cover(s, options) for s in sols]
+
+    assert len(sols) == 105
+    s1 = set([frozenset(s) for s in sols])
+    s2 = set([frozenset(s) for s in covers(options)])
+    assert s1 == s2
+
+    # options as a list of integer arrays, which may differ in length
+    options_arrays = [np.array(opt) for opt in options] + [np.arange(n)]
+    s3 = set([frozenset(s) for s in covers(options_arrays)])
+    assert s3 == s2 | {frozenset([len(options)])}
+
+    # options with no items at all, as for the equivalent list of lists
+    empty_options = np.zeros((3, 0), dtype=int)
+    assert list(covers(empty_options)) == list(covers([[], [], []])) == [[]]
+
 
 def test_unsolvable():
     options = [
@@ -176,6 +375,17 @@ def test_unsolvable():
     assert len(sols) == 0
 
 
+def test_item_in_every_option():
+    options = [["a"], ["a"]]
+    sols = list(covers(options))
+    [verify_exact_cover(s, options) for s in sols]
+
+    assert sorted(sols) == [[0], [1]]
+
+    sols = list(covers_bool(np.ones((2, 1), dtype=bool)))
+    assert sorted(sols) == [[0], [1]]
+
+
 def test_file_solve():
     import os
 
@@ -214,6 +424,9 @@ def test_file_solve_zdd():
                     use_memo_cache=use_memo_cache,
                     choose_heuristic=choose_heuristic,
                 )
+                zdd = list(zdd)
+                assert count_zdd(zdd) == nsol
+                assert count_zdd(reduce_zdd(zdd)) == nsol
                 algo_zdd = to_zdd_algorithms(zdd)
                 assert count(algo_zdd) == nsol
 
@@ -12,9 +12,14 @@ There are currently four solvers:
     cover_zdd -- exact cover with colors, but yields nodes of a ZDD not solutions
     covers_bool -- exact cover for problem specified as an array of bool
     covers_bool_zdd -- as above, but yields nodes of a ZDD not solutions
+
+A CompiledSolver converts a list of options once so that it can be solved
+repeatedly, e.g. with different choices of primary and secondary items.
     
 The underlying numba-accelerated algorithms behind these solvers can be called directly using either
     algorithm_c -- exact cover with colors
+    algorithm_c_bitset -- exact cover for dense boolean problems, using bitsets
+    algorithm_c_parallel -- exact cover with colors, searching on several threads
     algorithm_z -- exact cover with colors, but yields nodes of a ZDD
 but these require the problems to be first cast in sparse matrix form.
 """
@@ -22,6 +27,15 @@ but these require the problems to be first cast in sparse matrix form.
 __version__ = "0.2.5"
 __author__ = "John F. Rudge"
 
-from .solvers import covers, covers_bool, covers_zdd, covers_bool_zdd
-from .dancing_cells import algorithm_c
-from .dancing_cells_zdd import algorithm_z
+from .solvers import covers, covers_bool, covers_zdd, covers_bool_zdd, CompiledSolver
+from .dancing_cells import algorithm_c, algorithm_c_bitset, algorithm_c_parallel
+
+
+def __getattr__(name):
+    # algorithm_z is only imported (and so compiled or loaded from numba's
+    # cache) when it is first needed
+    if name == "algorithm_z":
+        from .dancing_cells_zdd import algorithm_z
+
+        return algorithm_z
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
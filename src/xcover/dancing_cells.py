@@ -2,7 +2,363 @@
 
 import numpy as np
 from numpy import uint32 as u
-from numba import njit
+from numba import njit, prange, types
+from numba.typed import List
+
+# columns of the per-node information array
+BEGIN, END, COLOR = 0, 1, 2
+# columns of the per-item information array
+SIZE, START = 0, 1
+
+
+@njit(cache=True, inline="always")
+def bit_test(bits, i):
+    """Whether bit i of a packed uint64 bitmap is set"""
+    return (bits[i >> u(6)] >> np.uint64(i & u(63))) & np.uint64(1) != np.uint64(0)
+
+
+@njit(cache=True, inline="always")
+def bit_set(bits, i):
+    """Set bit i of a packed uint64 bitmap"""
+    bits[i >> u(6)] |= np.uint64(1) << np.uint64(i & u(63))
+
+
+@njit(cache=True, inline="always")
+def bit_clear(bits, i):
+    """Clear bit i of a packed uint64 bitmap"""
+    bits[i >> u(6)] &= ~(np.uint64(1) << np.uint64(i & u(63)))
+
+
+@njit(cache=True, inline="always")
+def popcount(x):
+    """Number of set bits in a uint64 word, by SWAR bit counting"""
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + (
+        (x >> np.uint64(2)) & np.uint64(0x3333333333333333)
+    )
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+@njit(cache=True, inline="always")
+def lowest_bit(x):
+    """Index of the lowest set bit in a nonzero uint64 word"""
+    return popcount((x & (~x + np.uint64(1))) - np.uint64(1))
+
+
+@njit(cache=True)
+def active_insert(item, index, matrix_active_items, matrix_active_items_sparse):
+    """Insert an item into position index in the active_items sparse set"""
+    matrix_active_items[index] = item
+    matrix_active_items_sparse[item] = index
+
+
+@njit(cache=True)
+def deactivate_item(
+    item,
+    matrix_active_items,
+    matrix_active_items_sparse,
+    matrix_active_items_len,
+    active_bits,
+):
+    """C3: make an item inactive: remove from active_items list"""
+    bit_clear(active_bits, item)
+    end_index = matrix_active_items_len[0] - u(1)
+    end_item = matrix_active_items[end_index]
+    index = matrix_active_items_sparse[item]
+    active_insert(end_item, index, matrix_active_items, matrix_active_items_sparse)
+    active_insert(item, end_index, matrix_active_items, matrix_active_items_sparse)
+    matrix_active_items_len[0] -= u(1)
+
+
+@njit(cache=True)
+def active_options(item, matrix_set, item_info):
+    """the active options of a given item"""
+    return matrix_set[
+        item_info[item, START] : (item_info[item, START] + item_info[item, SIZE])
+    ]
+
+
+@njit(cache=True, inline="always")
+def remove_node(
+    node,
+    options,
+    matrix_set,
+    matrix_loc,
+    item_info,
+    trail,
+    trail_top,
+):
+    """remove a node from the matrix, recording it on the trail"""
+    item = options[node]
+    loc = matrix_loc[node]
+
+    end_loc = item_info[item, START] + item_info[item, SIZE] - u(1)
+    end_node = matrix_set[end_loc]
+
+    matrix_set[loc] = end_node
+    matrix_set[end_loc] = node
+    matrix_loc[end_node] = loc
+    matrix_loc[node] = end_loc
+    item_info[item, SIZE] -= u(1)
+
+    trail[trail_top[0]] = node
+    trail_top[0] += u(1)
+
+
+@njit(cache=True)
+def init_item_info(options, n_items):
+    """
+    C1: item_info packs together, for each item, the number of (active)
+    options and where its "column" in the matrix starts, as the two are
+    read together whenever a node is removed
+    """
+    item_info = np.zeros((n_items, 2), dtype=np.uint32)
+    for node in range(len(options)):
+        item_info[options[node], SIZE] += u(1)
+    item_info[u(1) :, START] = np.cumsum(item_info[:, SIZE])[:-1]
+    return item_info
+
+
+@njit(cache=True)
+def init_nodes(options, options_ptr, colors, item_info):
+    """
+    C1: the per-node arrays, all filled in a single pass over the options.
+    options_j gives the option index of each node in the matrix.
+    node_info packs together what hide needs to know about each node:
+    where its option begins and ends, and its color.
+    matrix_set and matrix_loc are sparse-set partners.
+    """
+    n_data = len(options)
+    options_j = np.empty(n_data, dtype=np.uint32)
+    node_info = np.empty((n_data, 3), dtype=np.uint32)
+    matrix_set = np.empty(n_data, dtype=np.uint32)
+    matrix_loc = np.empty(n_data, dtype=np.uint32)
+    counts = np.zeros(len(item_info), dtype=np.uint32)
+    for j in range(len(options_ptr) - 1):
+        begin = options_ptr[j]
+        end = options_ptr[j + 1]
+        for node in range(begin, end):
+            options_j[node] = j
+            node_info[node, BEGIN] = begin
+            node_info[node, END] = end
+            node_info[node, COLOR] = colors[node]
+            i = options[node]
+            val = item_info[i, START] + counts[i]
+            matrix_loc[node] = val
+            matrix_set[val] = node
+            counts[i] += u(1)
+    return options_j, node_info, matrix_set, matrix_loc
+
+
+@njit(cache=True)
+def init_active_items(n_items):
+    """
+    C1: the active items (items left to cover) use another sparse set,
+    matrix_active_items and matrix_active_items_sparse are partners.
+    Alongside are bitmaps of the currently active items, and of those
+    active at the start of the current cover, for cheap membership tests
+    in hide. The two are equal outside of cover, and are updated item by
+    item rather than copied.
+    """
+    matrix_active_items = np.arange(n_items, dtype=np.uint32)
+    matrix_active_items_sparse = np.arange(n_items, dtype=np.uint32)
+    matrix_active_items_len = np.empty(u(1), dtype=np.uint32)
+    matrix_active_items_len[0] = n_items
+
+    n_words = (n_items + u(63)) // u(64)
+    active_bits = np.zeros(n_words, dtype=np.uint64)
+    for item in range(n_items):
+        bit_set(active_bits, u(item))
+    old_active_bits = active_bits.copy()
+    return (
+        matrix_active_items,
+        matrix_active_items_sparse,
+        matrix_active_items_len,
+        active_bits,
+        old_active_bits,
+    )
+
+
+@njit(cache=True)
+def fail_first_order(options, options_ptr, colors, sizes, n_primary_items):
+    """
+    Copies of options and colors with the items of each option sorted so
+    that the most constrained (fewest options, primary before secondary)
+    come first, so that cover reaches a failing hide as early as possible
+    """
+    sorted_options = np.empty_like(options)
+    sorted_colors = np.empty_like(colors)
+    for j in range(len(options_ptr) - 1):
+        begin = options_ptr[j]
+        end = options_ptr[j + 1]
+        opt = options[begin:end]
+        key = u(2) * sizes[opt] + (opt >= n_primary_items)
+        order = np.argsort(key, kind="mergesort") + begin
+        sorted_options[begin:end] = options[order]
+        sorted_colors[begin:end] = colors[order]
+    return sorted_options, sorted_colors
+
+
+@njit(cache=True)
+def hide(
+    item,
+    col,
+    initial,
+    options,
+    node_info,
+    matrix_set,
+    matrix_loc,
+    item_info,
+    trail,
+    trail_top,
+    active_bits,
+    old_active_bits,
+    n_primary_items,
+):
+    """given an item and a coloring col, remove the relevant nodes"""
+    # initial refers to whether we're hiding directly after a choose operation
+    for node in active_options(item, matrix_set, item_info):
+        if col == 0 or node_info[node, COLOR] != col:
+            # visit the other nodes of the option, stepping over node itself
+            # arithmetically so that item is skipped without a branch
+            for t in range(node_info[node, BEGIN], node_info[node, END] - u(1)):
+                k = t + u(t >= node)
+                iprime = options[k]
+                if bit_test(old_active_bits, iprime):
+                    if (
+                        not initial
+                        and item_info[iprime, SIZE] == u(1)
+                        and iprime < n_primary_items
+                        and bit_test(active_bits, iprime)
+                    ):
+                        return False  # end if about to delete last
+                    remove_node(
+                        k,
+                        options,
+                        matrix_set,
+                        matrix_loc,
+                        item_info,
+                        trail,
+                        trail_top,
+                    )
+    return True
+
+
+@njit(cache=True)
+def cover(
+    node,
+    item,
+    options,
+    options_j,
+    node_info,
+    matrix_set,
+    matrix_loc,
+    item_info,
+    trail,
+    trail_top,
+    matrix_active_items,
+    matrix_active_items_sparse,
+    matrix_active_items_len,
+    active_bits,
+    old_active_bits,
+    n_primary_items,
+    n_opts,
+):
+    """C6 and C7: main cover routine. Returns n_opts if the cover fails."""
+    option = options_j[node]
+    ptr_range = range(node_info[node, BEGIN], node_info[node, END])
+
+    # C6: deactivate other items of option
+    for ptr in ptr_range:
+        itm = options[ptr]
+        if itm != item and bit_test(active_bits, itm):
+            deactivate_item(
+                itm,
+                matrix_active_items,
+                matrix_active_items_sparse,
+                matrix_active_items_len,
+                active_bits,
+            )
+
+    # C7: hiding nodes
+    for ptr in ptr_range:
+        itm = options[ptr]
+        col_hide = node_info[ptr, COLOR]
+        if itm != item and (itm < n_primary_items or bit_test(old_active_bits, itm)):
+            if not hide(
+                itm,
+                col_hide,
+                False,
+                options,
+                node_info,
+                matrix_set,
+                matrix_loc,
+                item_info,
+                trail,
+                trail_top,
+                active_bits,
+                old_active_bits,
+                n_primary_items,
+            ):
+                return n_opts
+
+    # outside of cover, old_active_bits is kept equal to active_bits, so
+    # the items of the option are now cleared in it too. If the cover
+    # fails this is left to undo, which restores both bitmaps
+    for ptr in ptr_range:
+        bit_clear(old_active_bits, options[ptr])
+    return option
+
+
+@njit(cache=True)
+def undo(
+    trail_mark,
+    active_len,
+    options,
+    item_info,
+    trail,
+    trail_top,
+    matrix_active_items,
+    matrix_active_items_len,
+    active_bits,
+    old_active_bits,
+):
+    """Restore a previous state of the matrix by rewinding the trail"""
+    # removed nodes are restored simply by growing their item's size again
+    while trail_top[0] > trail_mark:
+        trail_top[0] -= u(1)
+        item_info[options[trail[trail_top[0]]], SIZE] += u(1)
+    # items beyond the current end of the active list become active again
+    for k in range(matrix_active_items_len[0], active_len):
+        bit_set(active_bits, matrix_active_items[k])
+        bit_set(old_active_bits, matrix_active_items[k])
+    matrix_active_items_len[0] = active_len
+
+
+@njit(cache=True)
+def choose(item_info, active_bits, n_primary_items, n_items, n_data):
+    """C2: Choose the next item to cover. Return n_items if solved already"""
+    # Using the minimum remaining value (MRV) heuristic here. The primary
+    # items are the lowest numbered, so walk the set bits of the active
+    # bitmap up to n_primary_items, skipping whole words of inactive items
+    chosen_item = u(n_items)
+    chosen_length = n_data + u(1)
+    n_words = (n_primary_items + u(63)) >> u(6)
+    for word in range(n_words):
+        w = active_bits[word]
+        if word == n_words - 1 and n_primary_items & u(63):
+            w &= (np.uint64(1) << np.uint64(n_primary_items & u(63))) - np.uint64(1)
+        while w:
+            item = u(word << 6) + u(lowest_bit(w))
+            w &= w - np.uint64(1)
+            length = item_info[item, SIZE]
+            if length < chosen_length:
+                chosen_item = item
+                chosen_length = length
+                if chosen_length <= u(1):
+                    return chosen_item, chosen_length
+    return chosen_item, chosen_length
 
 
 @njit("(uint32[:], uint32[:], uint32[:], uint32, uint32)", cache=True)
@@ -30,194 +386,343 @@ def algorithm_c(options, options_ptr, colors, n_items, n_secondary_items):
     n_opts = u(len(options_ptr) - 1)
     n_primary_items = u(n_items - n_secondary_items)
 
-    # options_j gives the option index of each node in the matrix
-    options_j = np.empty(n_data, dtype=np.uint32)
-    for j, i in enumerate(range(n_opts)):
-        options_j[options_ptr[u(i)] : options_ptr[u(i + 1)]] = j
+    item_info = init_item_info(options, n_items)
+    options, colors = fail_first_order(
+        options, options_ptr, colors, item_info[:, SIZE], n_primary_items
+    )
+    options_j, node_info, matrix_set, matrix_loc = init_nodes(
+        options, options_ptr, colors, item_info
+    )
+    (
+        matrix_active_items,
+        matrix_active_items_sparse,
+        matrix_active_items_len,
+        active_bits,
+        old_active_bits,
+    ) = init_active_items(n_items)
 
-    # matrix_size gives the number of (active) options for each item
-    matrix_size = np.zeros(n_items, dtype=np.uint32)
-    for node in range(n_data):
-        matrix_size[options[node]] += u(1)
+    # the trail records each removed node so that backtracking only
+    # has to undo the work actually done, rather than copying all sizes
+    trail = np.empty(n_data, dtype=np.uint32)
+    trail_top = np.zeros(u(1), dtype=np.uint32)
 
-    # matrix_start_ptr points to the start of the "column" in the matrix
-    # for each item
-    matrix_start_ptr = np.empty(n_items, dtype=np.uint32)
-    matrix_start_ptr[0] = 0
-    matrix_start_ptr[u(1) :] = np.cumsum(matrix_size)[:-1]
+    # Main loop. A depth-first search, written here using a stack
+    # rather than recursive as numba doesn't support yield from.
+    # The nodes still to explore at depth d are read straight from the
+    # column of the chosen item, matrix_set[frame_start[d] + k] for
+    # k < frame_left[d], taken from the end. The chosen item is inactive
+    # below this depth, so nothing moves the nodes of its column.
+    max_depth = n_primary_items + u(2)
+    frame_start = np.empty(max_depth, dtype=np.uint32)
+    frame_left = np.empty(max_depth, dtype=np.uint32)
+    # saved trail positions, active list lengths and solution lengths
+    # for backtracking
+    saved_trail_top = np.empty(max_depth, dtype=np.uint32)
+    saved_active_len = np.empty(max_depth, dtype=np.uint32)
+    saved_solution_len = np.empty(max_depth, dtype=np.uint32)
 
-    # matrix_set and matrix_loc are sparse-set partners
-    matrix_set = np.empty(n_data, dtype=np.uint32)
-    matrix_loc = np.empty(n_data, dtype=np.uint32)
-    counts = np.zeros(n_items, dtype=np.uint32)
-    for node in range(n_data):
-        i = options[node]
-        val = matrix_start_ptr[i] + counts[i]
-        matrix_loc[node] = val
-        matrix_set[val] = node
-        counts[i] += u(1)
-
-    # the active items (items left to cover) use another sparse set
-    # matrix_active_items and matrix_active_items_sparse are partners
-    matrix_active_items = np.arange(n_items, dtype=np.uint32)
-    matrix_active_items_sparse = np.arange(n_items, dtype=np.uint32)
-    matrix_active_items_len = np.empty(u(1), dtype=np.uint32)
-    matrix_active_items_len[0] = n_items
-    matrix_old_active_items_len = np.empty(u(1), dtype=np.uint32)
-    matrix_active_items_len[0] = n_items
+    # the item whose options each frame holds
+    item_stack = np.empty(max_depth, dtype=np.uint32)
 
-    def active_insert(item, index):
-        """Insert an item into position index in the active_items sparse set"""
-        matrix_active_items[index] = item
-        matrix_active_items_sparse[item] = index
-
-    def deactivate_item(item):
-        """C3: make an item inactive: remove from active_items list"""
-        end_index = matrix_active_items_len[0] - u(1)
-        end_item = matrix_active_items[end_index]
-        index = matrix_active_items_sparse[item]
-        active_insert(end_item, index)
-        active_insert(item, end_index)
-        matrix_active_items_len[0] -= u(1)
-
-    def active_options(item):
-        """the active options of a given item"""
-        return matrix_set[
-            matrix_start_ptr[item] : (matrix_start_ptr[item] + matrix_size[item])
-        ]
-
-    def remove_node(node):
-        """remove a node from the matrix"""
-        item = options[node]
-        loc = matrix_loc[node]
-
-        end_loc = matrix_start_ptr[item] + matrix_size[item] - u(1)
-        end_node = matrix_set[end_loc]
-
-        matrix_set[loc] = end_node
-        matrix_set[end_loc] = node
-        matrix_loc[end_node] = loc
-        matrix_loc[node] = end_loc
-        matrix_size[item] -= u(1)
-
-    def hide(item, col, initial):
-        """given an item and a coloring col, remove the relevant nodes"""
-        # initial refers to whether we're hiding directly after a choose operation
-        for node in active_options(item):
-            if col == 0 or colors[node] != col:
-                j = options_j[node]
-                for k in range(options_ptr[j], options_ptr[j + u(1)]):
-                    iprime = options[k]
-                    if (
-                        iprime != item
-                        and matrix_active_items_sparse[iprime]
-                        < matrix_old_active_items_len[0]
-                    ):
-                        if (
-                            not initial
-                            and matrix_size[iprime] == u(1)
-                            and matrix_active_items_sparse[iprime]
-                            < matrix_active_items_len[0]
-                            and iprime < n_primary_items
-                        ):
-                            return False  # end if about to delete last
-                        remove_node(k)
-        return True
-
-    def cover(node, item):
-        """C6 and C7: main cover routine"""
-        option = options_j[node]
-        ptr_range = range(options_ptr[option], options_ptr[option + u(1)])
-        matrix_old_active_items_len[0] = matrix_active_items_len[0]
-
-        # C6: deactivate other items of option
-        for ptr in ptr_range:
-            itm = options[ptr]
-            if (
-                itm != item
-                and matrix_active_items_sparse[itm] < matrix_active_items_len[0]
-            ):
-                deactivate_item(itm)
-
-        # C7: hiding nodes
-        for ptr in ptr_range:
-            itm = options[ptr]
-            col_hide = colors[ptr]
-            if itm != item and (
-                itm < n_primary_items
-                or matrix_active_items_sparse[itm] < matrix_old_active_items_len[0]
-            ):
-                status = hide(itm, col_hide, False)
-                if status is False:
-                    return n_opts
-        return option
-
-    def save_state():
-        """C5: Save the current state (sizes) for backtracking"""
-        return (matrix_size[:].copy(), matrix_active_items_len[0])
-
-    def undo(state):
-        """Restore a previous state of the matrix"""
-        matrix_size[:], matrix_active_items_len[0] = state
-
-    def choose():
-        """C2: Choose the next item to cover. Return n_data if solved already"""
-        # Using the minimum remaining value (MRV) heuristic here
-        active_items = matrix_active_items[0 : matrix_active_items_len[0]]
-        chosen_item = n_items
-        chosen_length = n_data
-        for item in active_items:
-            if item < n_primary_items and matrix_size[item] < chosen_length:
-                chosen_item = item
-                chosen_length = matrix_size[item]
-                if chosen_length == u(1):
-                    return chosen_item, chosen_length
-        return chosen_item, chosen_length
-
-    # Main loop. A depth-first search, written here using a stack
-    # rather than recursive as numba doesn't support yield from
-    solution = []  # current solution
-    node_stack = [[n_data]]  # current list of nodes to explore (n_data is root)
-    item_stack = [n_items]  # current list of covered items
-    initial_state = save_state()  # saved state for backtracking
-    state_stack = [initial_state]  # stack of states
-    null_state = (np.empty(0, dtype=np.uint32), u(1))  # null state used as placeholder
+    # the current partial solution is solution[:sol_len]. Each option
+    # covers at least one primary item, so there are at most
+    # n_primary_items of them
+    solution = np.empty(max_depth, dtype=np.uint32)
+    sol_len = 0
+    item_stack[0] = n_items
+    frame_start[0] = 0
+    frame_left[0] = 1  # the root
+    saved_trail_top[0] = trail_top[0]
+    saved_active_len[0] = matrix_active_items_len[0]
+    saved_solution_len[0] = 0
+    depth = 0
 
     need_to_undo = False
-    while node_stack:
-        if len(node_stack[-1]) == 0:
+    while depth >= 0:
+        if frame_left[depth] == 0:
             # backtracking, C10
-            node_stack.pop()
-            state_stack.pop()
-            item_stack.pop()
+            depth -= 1
             need_to_undo = True
-            if solution:
-                solution.pop()
         else:
             if need_to_undo:
-                undo(state_stack[-1])  # return to previous state, C11
+                # return to previous state, C11
+                undo(
+                    saved_trail_top[depth],
+                    saved_active_len[depth],
+                    options,
+                    item_info,
+                    trail,
+                    trail_top,
+                    matrix_active_items,
+                    matrix_active_items_len,
+                    active_bits,
+                    old_active_bits,
+                )
                 need_to_undo = False
+            sol_len = saved_solution_len[depth]
 
-            node = u(node_stack[-1].pop())  # C6
-            option = (
-                n_opts + u(1) if node == n_data else cover(node, item_stack[-1])
-            )  # C6 and C7
-            if option == n_opts:  # case where cover failed
-                need_to_undo = True
+            frame_left[depth] -= u(1)
+            item = item_stack[depth]
+            if item == n_items:
+                node = n_data  # n_data is the root
             else:
+                node = matrix_set[frame_start[depth] + frame_left[depth]]  # C6
+            while True:
+                if node == n_data:
+                    option = n_opts + u(1)
+                else:
+                    # C6 and C7
+                    option = cover(
+                        node,
+                        item,
+                        options,
+                        options_j,
+                        node_info,
+                        matrix_set,
+                        matrix_loc,
+                        item_info,
+                        trail,
+                        trail_top,
+                        matrix_active_items,
+                        matrix_active_items_sparse,
+                        matrix_active_items_len,
+                        active_bits,
+                        old_active_bits,
+                        n_primary_items,
+                        n_opts,
+                    )
+                if option == n_opts:  # case where cover failed
+                    need_to_undo = True
+                    break
                 if option < n_opts:
-                    solution.append(option)  # include option in partial solution
-                item, length = choose()  # C2
+                    solution[sol_len] = option  # include option in partial solution
+                    sol_len += 1
+                item, length = choose(
+                    item_info, active_bits, n_primary_items, n_items, n_data
+                )  # C2
                 if item == n_items:
-                    yield list(solution)  # found a solution!
-                    solution.pop()
+                    yield list(solution[:sol_len])  # found a solution!
                     need_to_undo = True
-                else:
-                    item_stack.append(item)
-                    deactivate_item(item)  # C3
-                    matrix_old_active_items_len[0] = matrix_active_items_len[0]
-                    hide(item, 0, True)  # C4
-                    state_stack.append(
-                        null_state if length == 1 else save_state()
-                    )  # C5 (don't need to trail forced moves)
-                    node_stack.append(list(active_options(item)))
+                    break
+                deactivate_item(
+                    item,
+                    matrix_active_items,
+                    matrix_active_items_sparse,
+                    matrix_active_items_len,
+                    active_bits,
+                )  # C3
+                bit_clear(old_active_bits, item)
+                hide(
+                    item,
+                    u(0),
+                    True,
+                    options,
+                    node_info,
+                    matrix_set,
+                    matrix_loc,
+                    item_info,
+                    trail,
+                    trail_top,
+                    active_bits,
+                    old_active_bits,
+                    n_primary_items,
+                )  # C4
+                if length == 1:
+                    # a forced move: there is nothing to branch on, so cover
+                    # the only option straight away rather than push a frame.
+                    # Backtracking to this frame undoes the whole chain.
+                    node = matrix_set[item_info[item, START]]
+                    continue
+
+                # push a new frame holding the active options of item
+                depth += 1
+                item_stack[depth] = item
+                saved_trail_top[depth] = trail_top[0]  # C5
+                saved_active_len[depth] = matrix_active_items_len[0]
+                saved_solution_len[depth] = sol_len
+                frame_start[depth] = item_info[item, START]
+                frame_left[depth] = length
+                break
+
+
+# A generator loaded from the on-disk cache cannot be consumed by other
+# jitted functions, so algorithm_c_parallel uses an uncached compilation
+algorithm_c_uncached = njit(algorithm_c.py_func)
+
+
+@njit(cache=True, parallel=True)
+def algorithm_c_parallel(options, options_ptr, colors, n_items, n_secondary_items):
+    """
+    A parallel variant of algorithm C, in which the subtrees below the
+    options of the first chosen item are searched on separate threads.
+    Exact covering with colors.
+
+    Parameters
+    ----------
+    options: array of integers, giving all options
+    options_ptr: array of integers, pointing where each option
+                 begins and ends
+    colors: the color of each item in each option
+    n_items: the number of possible items
+    n_secondary_items: the number of items that are secondary
+
+    Returns
+    -------
+    a list of all the solutions to the exact cover problem, each an
+    array of option indices
+    """
+    n_opts = len(options_ptr) - 1
+    n_primary_items = n_items - n_secondary_items
+
+    # choose the first item as algorithm C would, by MRV
+    matrix_size = init_item_info(options, n_items)[:, SIZE]
+    first_item = n_items
+    for item in range(n_primary_items):
+        if first_item == n_items or matrix_size[item] < matrix_size[first_item]:
+            first_item = item
+
+    # the options containing the first item, one per subtree
+    has_first = np.zeros(n_opts, dtype=np.bool_)
+    for j in range(n_opts):
+        for node in range(options_ptr[j], options_ptr[j + 1]):
+            if options[node] == first_item:
+                has_first[j] = True
+    roots = np.nonzero(has_first)[0]
+    n_roots = len(roots)
+    if first_item == n_items:
+        # nothing to branch on, so search the whole problem in one go
+        roots = np.zeros(1, dtype=np.int64)
+        n_roots = 1
+
+    sols = List()
+    for k in range(n_roots):
+        sols.append(List.empty_list(types.uint32[:]))
+
+    for k in prange(n_roots):
+        # The subproblem for root k drops the other options containing
+        # the first item, so every solution of it uses option roots[k].
+        # With nothing to branch on all the options are kept (and there
+        # may be none at all, so there is no root to index)
+        keep = ~has_first
+        if first_item < n_items:
+            keep[roots[k]] = True
+        kept = np.nonzero(keep)[0]
+        sub_ptr = np.zeros(len(kept) + 1, dtype=np.uint32)
+        for i in range(len(kept)):
+            j = kept[i]
+            sub_ptr[i + 1] = sub_ptr[i] + options_ptr[j + 1] - options_ptr[j]
+        sub_options = np.empty(sub_ptr[-1], dtype=np.uint32)
+        sub_colors = np.empty(sub_ptr[-1], dtype=np.uint32)
+        for i in range(len(kept)):
+            j = kept[i]
+            begin = options_ptr[j]
+            end = options_ptr[j + 1]
+            sub_options[sub_ptr[i] : sub_ptr[i + 1]] = options[begin:end]
+            sub_colors[sub_ptr[i] : sub_ptr[i + 1]] = colors[begin:end]
+
+        for solution in algorithm_c_uncached(
+            sub_options, sub_ptr, sub_colors, n_items, n_secondary_items
+        ):
+            sol = np.empty(len(solution), dtype=np.uint32)
+            for i in range(len(solution)):
+                sol[i] = kept[solution[i]]
+            sols[np.int64(k)].append(sol)
+
+    # join the solutions of the subtrees in order
+    all_sols = List.empty_list(types.uint32[:])
+    for k in range(n_roots):
+        for sol in sols[k]:
+            all_sols.append(sol)
+    return all_sols
+
+
+@njit(cache=True)
+def algorithm_c_bitset(rows, cols):
+    """
+    A bitset variant of algorithm C for dense boolean problems.
+    Exact covering without secondary items or colors.
+
+    Parameters
+    ----------
+    rows: array of uint64 words, row i is a bitset of the items in option i
+    cols: array of uint64 words, row j is a bitset of the options
+          containing item j
+
+    Returns
+    -------
+    a generator object that yields solutions to the exact cover problem
+    """
+
+    n_opts = rows.shape[0]
+    n_items = cols.shape[0]
+    n_col_words = rows.shape[1]
+    n_row_words = cols.shape[1]
+
+    # Each level of the search covers at least one item, so the depth is at
+    # most n_items. At each depth keep bitsets of the active items and
+    # options, and of the options still to try for the chosen item.
+    active_cols = np.zeros((n_items + 1, n_col_words), dtype=np.uint64)
+    active_rows = np.zeros((n_items + 1, n_row_words), dtype=np.uint64)
+    to_try = np.zeros((n_items + 1, n_row_words), dtype=np.uint64)
+    for j in range(n_items):
+        active_cols[0, j >> 6] |= np.uint64(1) << np.uint64(j & 63)
+    for i in range(n_opts):
+        active_rows[0, i >> 6] |= np.uint64(1) << np.uint64(i & 63)
+    solution = np.empty(n_items + 1, dtype=np.uint32)
+
+    depth = 0
+    need_to_choose = True
+    while depth >= 0:
+        if need_to_choose:
+            # Choose the active item with fewest active options (MRV)
+            need_to_choose = False
+            chosen_item = n_items
+            chosen_length = n_opts + 1
+            for w in range(n_col_words):
+                word = active_cols[depth, w]
+                while word:
+                    j = w * 64 + lowest_bit(word)
+                    word &= word - np.uint64(1)
+                    length = 0
+                    for k in range(n_row_words):
+                        length += popcount(cols[j, k] & active_rows[depth, k])
+                    if length < chosen_length:
+                        chosen_item = j
+                        chosen_length = length
+                        if chosen_length <= 1:
+                            break
+                if chosen_length <= 1:
+                    break
+            if chosen_item == n_items:
+                yield list(solution[:depth])  # found a solution!
+                depth -= 1
+                continue
+            for k in range(n_row_words):
+                to_try[depth, k] = cols[chosen_item, k] & active_rows[depth, k]
+
+        # Take the next option to try at this depth, backtracking if none left
+        row = n_opts
+        for k in range(n_row_words):
+            word = to_try[depth, k]
+            if word:
+                row = k * 64 + lowest_bit(word)
+                to_try[depth, k] = word & (word - np.uint64(1))
+                break
+        if row == n_opts:
+            depth -= 1
+            continue
+
+        # Cover: remove the items of the option, and every option that
+        # shares an item with it
+        solution[depth] = row
+        active_rows[depth + 1, :] = active_rows[depth, :]
+        for w in range(n_col_words):
+            word = rows[row, w] & active_cols[depth, w]
+            active_cols[depth + 1, w] = active_cols[depth, w] & ~rows[row, w]
+            while word:
+                j = w * 64 + lowest_bit(word)
+                word &= word - np.uint64(1)
+                for k in range(n_row_words):
+                    active_rows[depth + 1, k] &= ~cols[j, k]
+        depth += 1
+        need_to_choose = True
@@ -3,6 +3,235 @@
 import numpy as np
 from numpy import uint32 as u
 from numba import njit, types
+from numba.typed import Dict
+
+from .dancing_cells import (
+    BEGIN,
+    END,
+    COLOR,
+    SIZE,
+    START,
+    active_insert,
+    bit_clear,
+    bit_test,
+    hide,
+    init_active_items,
+    init_item_info,
+    init_nodes,
+    undo,
+)
+
+
+@njit(cache=True, inline="always")
+def deactivate_item(
+    item,
+    matrix_active_items,
+    matrix_active_items_sparse,
+    matrix_active_items_len,
+    active_bits,
+    primary_active_items,
+    primary_active_items_sparse,
+    primary_active_items_len,
+    n_primary_items,
+):
+    """C3: make an item inactive: remove from the active_items lists"""
+    bit_clear(active_bits, item)
+    end_index = matrix_active_items_len[0] - u(1)
+    end_item = matrix_active_items[end_index]
+    index = matrix_active_items_sparse[item]
+    active_insert(end_item, index, matrix_active_items, matrix_active_items_sparse)
+    active_insert(item, end_index, matrix_active_items, matrix_active_items_sparse)
+    matrix_active_items_len[0] -= u(1)
+
+    if item < n_primary_items:
+        end_index = primary_active_items_len[0] - u(1)
+        end_item = primary_active_items[end_index]
+        index = primary_active_items_sparse[item]
+        active_insert(
+            end_item, index, primary_active_items, primary_active_items_sparse
+        )
+        active_insert(
+            item, end_index, primary_active_items, primary_active_items_sparse
+        )
+        primary_active_items_len[0] -= u(1)
+
+
+@njit(cache=True, inline="always")
+def cover(
+    node,
+    item,
+    options,
+    options_j,
+    node_info,
+    matrix_set,
+    matrix_loc,
+    item_info,
+    trail,
+    trail_top,
+    matrix_active_items,
+    matrix_active_items_sparse,
+    matrix_active_items_len,
+    active_bits,
+    old_active_bits,
+    primary_active_items,
+    primary_active_items_sparse,
+    primary_active_items_len,
+    item_colorings,
+    n_primary_items,
+    n_opts,
+):
+    """C6 and C7: main cover routine. Returns n_opts if the cover fails."""
+    option = options_j[node]
+    ptr_range = range(node_info[node, BEGIN], node_info[node, END])
+
+    # C6: deactivate other items of option
+    for ptr in ptr_range:
+        itm = options[ptr]
+        if itm != item and bit_test(active_bits, itm):
+            deactivate_item(
+                itm,
+                matrix_active_items,
+                matrix_active_items_sparse,
+                matrix_active_items_len,
+                active_bits,
+                primary_active_items,
+                primary_active_items_sparse,
+                primary_active_items_len,
+                n_primary_items,
+            )
+            # Record the coloring of secondary items for memoization
+            if itm >= n_primary_items:
+                item_colorings[itm - n_primary_items] = node_info[ptr, COLOR]
+
+    # C7: hiding nodes
+    for ptr in ptr_range:
+        itm = options[ptr]
+        col_hide = node_info[ptr, COLOR]
+        if itm != item and (itm < n_primary_items or bit_test(old_active_bits, itm)):
+            if not hide(
+                itm,
+                col_hide,
+                False,
+                options,
+                node_info,
+                matrix_set,
+                matrix_loc,
+                item_info,
+                trail,
+                trail_top,
+                active_bits,
+                old_active_bits,
+                n_primary_items,
+            ):
+                return n_opts
+
+    # outside of cover, old_active_bits is kept equal to active_bits, so
+    # the items of the option are now cleared in it too. If the cover
+    # fails this is left to undo, which restores both bitmaps
+    for ptr in ptr_range:
+        bit_clear(old_active_bits, options[ptr])
+    return option
+
+
+@njit(cache=True, inline="always")
+def choose_leftmost(item_info, active_bits, n_primary_items, n_items, n_data):
+    """C2: Choose the next item to cover. Return n_items if solved already"""
+    # Using the item with smallest index here
+    for item in range(n_primary_items):
+        if bit_test(active_bits, item):
+            return u(item), item_info[item, SIZE]
+    return u(n_items), n_data
+
+
+@njit(cache=True, inline="always")
+def choose_mrv(
+    item_info, primary_active_items, primary_active_items_len, n_items, n_data
+):
+    """C2: Choose the next item to cover. Return n_items if solved already"""
+    # Using the minimum remaining value (MRV) heuristic here
+    chosen_item = u(n_items)
+    chosen_length = n_data + u(1)
+    for item in primary_active_items[0 : primary_active_items_len[0]]:
+        length = item_info[item, SIZE]
+        if length < chosen_length:
+            chosen_item = item
+            chosen_length = length
+            if chosen_length <= u(1):
+                break
+    return chosen_item, chosen_length
+
+
+@njit(cache=True, inline="always")
+def zobrist_key(bit):
+    """A pseudo-random 64-bit key for a signature bit, by splitmix64"""
+    z = np.uint64(bit) * np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+@njit(cache=True, inline="always")
+def flip_signature_bit(sig_array, sig_hash, bit):
+    """Flip a particular bit in the signature, updating its hash to match"""
+    sig_array[bit >> u(6)] ^= np.uint64(1) << np.uint64(bit & u(63))
+    sig_hash[0] ^= zobrist_key(bit)
+
+
+@njit(cache=True)
+def flip_items(
+    sig_array,
+    sig_hash,
+    items,
+    item_colorings,
+    n_items,
+    n_primary_items,
+    n_colors,
+):
+    """
+    Flip the given items in the signature between active and covered.
+    An active item has its own bit set. A covered secondary item instead
+    has a bit indicating its coloring, as this decides which of its
+    options are still available.
+    """
+    for s in items:
+        flip_signature_bit(sig_array, sig_hash, s)
+        if s >= n_primary_items:
+            y = s - n_primary_items
+            flip_signature_bit(
+                sig_array, sig_hash, n_items + (n_colors + 1) * y + item_colorings[y]
+            )
+
+
+@njit(cache=True)
+def memo_reserve(n_memo, memo_signatures, memo_zdd):
+    """
+    Make room for one more memoized state, doubling the memo arrays
+    when they are full. Returns the (possibly new) memo arrays.
+    """
+    if n_memo == len(memo_zdd):
+        new_signatures = np.empty(
+            (2 * n_memo, memo_signatures.shape[1]), dtype=np.uint64
+        )
+        new_signatures[:n_memo] = memo_signatures
+        new_zdd = np.empty(2 * n_memo, dtype=np.uint32)
+        new_zdd[:n_memo] = memo_zdd
+        return new_signatures, new_zdd
+    return memo_signatures, memo_zdd
+
+
+@njit(cache=True)
+def memo_find(h, sig_array, memo_cache, memo_signatures):
+    """
+    Find the memo slot of the present signature, given its hash.
+    Returns the slot (or -1 if not memoized) and the hash key to use,
+    as signatures whose hashes collide are stored at the next free key
+    """
+    while h in memo_cache:
+        slot = memo_cache[h]
+        if np.array_equal(memo_signatures[slot], sig_array):
+            return slot, h
+        h += np.uint64(1)
+    return -1, h
 
 
 @njit(
@@ -45,292 +274,316 @@ def algorithm_z(
     n_opts = u(len(options_ptr) - 1)
     n_primary_items = u(n_items - n_secondary_items)
     n_colors = max(colors)
-
-    # options_j gives the option index of each node in the matrix
-    options_j = np.empty(n_data, dtype=np.uint32)
-    for j, i in enumerate(range(n_opts)):
-        options_j[options_ptr[u(i)] : options_ptr[u(i + 1)]] = j
-
-    # matrix_size gives the number of (active) options for each item
-    matrix_size = np.zeros(n_items, dtype=np.uint32)
-    for node in range(n_data):
-        matrix_size[options[node]] += u(1)
-
-    # matrix_start_ptr points to the start of the "column" in the matrix
-    # for each item
-    matrix_start_ptr = np.empty(n_items, dtype=np.uint32)
-    matrix_start_ptr[0] = 0
-    matrix_start_ptr[u(1) :] = np.cumsum(matrix_size)[:-1]
-
-    # matrix_set and matrix_loc are sparse-set partners
-    matrix_set = np.empty(n_data, dtype=np.uint32)
-    matrix_loc = np.empty(n_data, dtype=np.uint32)
-    counts = np.zeros(n_items, dtype=np.uint32)
-    for node in range(n_data):
-        i = options[node]
-        val = matrix_start_ptr[i] + counts[i]
-        matrix_loc[node] = val
-        matrix_set[val] = node
-        counts[i] += u(1)
-
-    # the active items (items left to cover) use another sparse set
-    # matrix_active_items and matrix_active_items_sparse are partners
-    matrix_active_items = np.arange(n_items, dtype=np.uint32)
-    matrix_active_items_sparse = np.arange(n_items, dtype=np.uint32)
-    matrix_active_items_len = np.empty(u(1), dtype=np.uint32)
-    matrix_active_items_len[0] = n_items
-    matrix_old_active_items_len = np.empty(u(1), dtype=np.uint32)
-    matrix_active_items_len[0] = n_items
-
-    # record of the colorings
+    leftmost = choose_heuristic == "leftmost"
+
+    item_info = init_item_info(options, n_items)
+    options_j, node_info, matrix_set, matrix_loc = init_nodes(
+        options, options_ptr, colors, item_info
+    )
+    (
+        matrix_active_items,
+        matrix_active_items_sparse,
+        matrix_active_items_len,
+        active_bits,
+        old_active_bits,
+    ) = init_active_items(n_items)
+
+    # the active primary items also have a sparse set of their own, so
+    # that choose_mrv can scan them without skipping secondary items
+    primary_active_items = np.arange(n_primary_items, dtype=np.uint32)
+    primary_active_items_sparse = np.arange(n_primary_items, dtype=np.uint32)
+    primary_active_items_len = np.empty(u(1), dtype=np.uint32)
+    primary_active_items_len[0] = n_primary_items
+
+    # record of the colorings: the color each inactive secondary item was
+    # covered with (0 if uncolored). The colorings of active items are
+    # never read, so they need no undoing on backtracking.
     item_colorings = np.zeros(n_secondary_items, dtype=np.uint32)
 
-    def active_insert(item, index):
-        """Insert an item into position index in the active_items sparse set"""
-        matrix_active_items[index] = item
-        matrix_active_items_sparse[item] = index
-
-    def deactivate_item(item):
-        """C3: make an item inactive: remove from active_items list"""
-        end_index = matrix_active_items_len[0] - u(1)
-        end_item = matrix_active_items[end_index]
-        index = matrix_active_items_sparse[item]
-        active_insert(end_item, index)
-        active_insert(item, end_index)
-        matrix_active_items_len[0] -= u(1)
-
-    def active_options(item):
-        """the active options of a given item"""
-        return matrix_set[
-            matrix_start_ptr[item] : (matrix_start_ptr[item] + matrix_size[item])
-        ]
-
-    def remove_node(node):
-        """remove a node from the matrix"""
-        item = options[node]
-        loc = matrix_loc[node]
-
-        end_loc = matrix_start_ptr[item] + matrix_size[item] - u(1)
-        end_node = matrix_set[end_loc]
-
-        matrix_set[loc] = end_node
-        matrix_set[end_loc] = node
-        matrix_loc[end_node] = loc
-        matrix_loc[node] = end_loc
-        matrix_size[item] -= u(1)
-
-    def hide(item, col, initial):
-        """given an item and a coloring col, remove the relevant nodes"""
-        # initial refers to whether we're hiding directly after a choose operation
-
-        for node in active_options(item):
-            if col == 0 or colors[node] != col:
-                j = options_j[node]
-                for k in range(options_ptr[j], options_ptr[j + u(1)]):
-                    iprime = options[k]
-                    if (
-                        iprime != item
-                        and matrix_active_items_sparse[iprime]
-                        < matrix_old_active_items_len[0]
-                    ):
-                        if (
-                            not initial
-                            and matrix_size[iprime] == u(1)
-                            and matrix_active_items_sparse[iprime]
-                            < matrix_active_items_len[0]
-                            and iprime < n_primary_items
-                        ):
-                            return False  # end if about to delete last
-                        remove_node(k)
-                    # Record the coloring of secondary items for memoization
-                    if iprime >= n_primary_items:
-                        item_colorings[iprime - n_primary_items] = colors[k]
-
-        return True
-
-    def cover(node, item):
-        """C6 and C7: main cover routine"""
-        option = options_j[node]
-        ptr_range = range(options_ptr[option], options_ptr[option + u(1)])
-        matrix_old_active_items_len[0] = matrix_active_items_len[0]
-
-        # C6: deactivate other items of option
-        for ptr in ptr_range:
-            itm = options[ptr]
-            if (
-                itm != item
-                and matrix_active_items_sparse[itm] < matrix_active_items_len[0]
-            ):
-                deactivate_item(itm)
-
-        # C7: hiding nodes
-        for ptr in ptr_range:
-            itm = options[ptr]
-            col_hide = colors[ptr]
-
-            if itm != item and (
-                itm < n_primary_items
-                or matrix_active_items_sparse[itm] < matrix_old_active_items_len[0]
-            ):
-
-                status = hide(itm, col_hide, False)
-                if status is False:
-                    return n_opts
-
-        return option
-
-    def save_state():
-        """C5: Save the current state (sizes) for backtracking"""
-        return (
-            matrix_size[:].copy(),
-            matrix_active_items_len[0],
-            item_colorings[:].copy(),
-        )
-
-    def undo(state):
-        """Restore a previous state of the matrix"""
-        matrix_size[:], matrix_active_items_len[0], item_colorings[:] = state
-
-    def choose_leftmost():
-        """C2: Choose the next item to cover. Return n_data if solved already"""
-        # Using the item with smallest index here
-        for item in range(n_primary_items):
-            if matrix_active_items_sparse[item] < matrix_active_items_len[0]:
-                return item, matrix_size[item]
-        return n_items, n_data
-
-    def choose_mrv():
-        """C2: Choose the next item to cover. Return n_data if solved already"""
-        # Using the minimum remaining value (MRV) heuristic here
-
-        active_items = matrix_active_items[0 : matrix_active_items_len[0]]
-        chosen_item = n_items
-        chosen_length = n_data
-        for item in active_items:
-            if item < n_primary_items and matrix_size[item] < chosen_length:
-                chosen_item = item
-                chosen_length = matrix_size[item]
-                if chosen_length == u(1):
-                    return chosen_item, chosen_length
-        return chosen_item, chosen_length
-
-    def choose():
-        return choose_leftmost() if choose_heuristic == "leftmost" else choose_mrv()
-
-    # Array for storing a signature of the present state
-    bytelength = 1 + ((n_items + (n_colors + 1) * n_secondary_items) // 8)
-    sig_array = np.zeros(bytelength, dtype=np.uint8)
-
-    def set_signature_bit(bit):
-        """Set a particular bit in the signature"""
-        sig_array[bit // 8] |= np.uint8(1) << (bit % 8)
-
-    def signature(ma_len):
-        sig_array[:] = 0
-        for s in matrix_active_items[0:ma_len]:
-            # set bit for each active item
-            set_signature_bit(s)
-            if s >= n_primary_items:
-                # for colored secondary items, set a bit indicating coloring
-                y = s - n_primary_items
-                set_signature_bit(n_items + (n_colors + 1) * y + item_colorings[y])
-        # Return signature as a hash -- does this by first producing string
-        # as numba doens't seem to support hashing of array bytes
-        # Potential for optimization here.
-        return hash("".join([chr(k) for k in sig_array]))
+    # the trail records each removed node so that backtracking only
+    # has to undo the work actually done, rather than copying all sizes
+    trail = np.empty(n_data, dtype=np.uint32)
+    trail_top = np.zeros(u(1), dtype=np.uint32)
+
+    # Array for storing a signature of the present state, as uint64 words,
+    # and its Zobrist hash: the xor of a key for each set bit. Both are
+    # updated incrementally, only for the items that changed since the
+    # last signature. The signature is that of the state in which the
+    # active items are those in matrix_active_items[0:sig_len]; as items
+    # are only deactivated between calls to undo, this is always a
+    # superset of the true active items, the difference being the items
+    # deactivated since, at positions matrix_active_items_len[0]:sig_len
+    n_sig_words = 1 + ((n_items + (n_colors + 1) * n_secondary_items) // 64)
+    sig_array = np.zeros(n_sig_words, dtype=np.uint64)
+    sig_hash = np.zeros(1, dtype=np.uint64)
+    for item in range(n_items):
+        flip_signature_bit(sig_array, sig_hash, u(item))
+    sig_len = n_items
+
+    # the memo_cache is a dictionary that maps signature hashes to slots
+    # in memo_signatures and memo_zdd, the full signature (to tell apart
+    # colliding hashes) and the ZDD node of the state. The first n_memo
+    # slots are in use; the arrays grow by doubling, so that storing a
+    # state is a copy into place rather than a new array per state
+    memo_cache = Dict.empty(key_type=types.uint64, value_type=types.int64)
+    memo_signatures = np.empty((64, n_sig_words), dtype=np.uint64)
+    memo_zdd = np.empty(64, dtype=np.uint32)
+    n_memo = 0
 
     # Main loop. A depth-first search, written here using a stack
-    # rather than recursive as numba doesn't support yield from
-    solution = []  # current solution
-    node_stack = [[n_data]]  # current list of nodes to explore (n_data is root)
-    item_stack = [n_items]  # current list of covered items
-    initial_state = save_state()  # saved state for backtracking
-    state_stack = [initial_state]  # stack of states
-    null_state = (
-        np.empty(0, dtype=np.uint32),
-        u(1),
-        np.empty(0, dtype=np.uint32),
-    )  # null state used as placeholder
-    null_list = [n_data]
-    null_list.pop()  # null list used as placeholder
-
-    zdd_stack = []
+    # rather than recursive as numba doesn't support yield from.
+    # The nodes still to explore at depth d are read straight from the
+    # column of the chosen item, matrix_set[frame_start[d] + k] for
+    # k < frame_left[d], taken from the end. The chosen item is inactive
+    # below this depth, so nothing moves the nodes of its column.
+    max_depth = n_primary_items + u(2)
+    frame_start = np.empty(max_depth, dtype=np.uint32)
+    frame_left = np.empty(max_depth, dtype=np.uint32)
+    # saved trail positions and active list lengths for backtracking (C5).
+    # Frames with no options left to try are never returned to, so
+    # nothing need be saved for them
+    saved_trail_top = np.empty(max_depth, dtype=np.uint32)
+    saved_active_len = np.empty(max_depth, dtype=np.uint32)
+    saved_primary_len = np.empty(max_depth, dtype=np.uint32)
+    # the item whose options each frame holds, and the option covered
+    # to reach each frame, solution[d - 1] for the frame at depth d > 0
+    item_stack = np.empty(max_depth, dtype=np.uint32)
+    solution = np.empty(max_depth, dtype=np.uint32)
+    # the ZDD node built so far for the state at each depth, and its
+    # memo slot
+    zdd_stack = np.empty(max_depth, dtype=np.uint32)
+    memo_stack = np.empty(max_depth, dtype=np.int64)
+    frame_start[0] = 0
+    frame_left[0] = 1  # the root
+    item_stack[0] = n_items
+    saved_trail_top[0] = trail_top[0]
+    saved_active_len[0] = matrix_active_items_len[0]
+    saved_primary_len[0] = primary_active_items_len[0]
+    depth = 0
     zdd_index = 1
 
     if use_memo_cache:
         # cache_hit = 0
-        memo_stack = []
-        # the memo_cache is a dictionary that maps signatures to ZDD nodes
-        memo_cache = {}
-        memo_cache[signature(u(0))] = u(1)
+        # the state with every item covered is the true node
+        flip_items(
+            sig_array,
+            sig_hash,
+            matrix_active_items[0:n_items],
+            item_colorings,
+            n_items,
+            n_primary_items,
+            n_colors,
+        )
+        _, h = memo_find(sig_hash[0], sig_array, memo_cache, memo_signatures)
+        memo_cache[h] = 0
+        memo_signatures[0] = sig_array
+        memo_zdd[0] = 1
+        n_memo = 1
+        flip_items(
+            sig_array,
+            sig_hash,
+            matrix_active_items[0:n_items],
+            item_colorings,
+            n_items,
+            n_primary_items,
+            n_colors,
+        )
 
     need_to_undo = False
-    while node_stack:
+    while depth >= 0:
 
-        if len(node_stack[-1]) == 0:
+        if frame_left[depth] == 0:
             # backtracking, C10
-            node_stack.pop()
-            state_stack.pop()
-            item_stack.pop()
+            depth -= 1
             need_to_undo = True
-            if solution:
-                s = solution.pop()
-                hi = zdd_stack.pop()
+            if depth > 0:
+                s = solution[depth - 1]
+                hi = zdd_stack[depth]
                 if hi > 0:
                     zdd_index += 1
-                    lo = zdd_stack[-1]
+                    lo = zdd_stack[depth - 1]
                     yield (zdd_index, s, lo, hi)  # the ZDD node
-                    zdd_stack[-1] = zdd_index
+                    zdd_stack[depth - 1] = zdd_index
 
                 if use_memo_cache:
-                    memo = memo_stack.pop()
-                    if memo not in memo_cache:
-                        memo_cache[memo] = u(hi)
+                    memo_zdd[memo_stack[depth]] = hi
 
         else:
             if need_to_undo:
-                undo(state_stack[-1])  # return to previous state, C11
+                # return to previous state, C11
+                active_len = saved_active_len[depth]
+                primary_active_items_len[0] = saved_primary_len[depth]
+                if use_memo_cache:
+                    # the items between the signature's active length and
+                    # the restored one change state in the signature
+                    flip_items(
+                        sig_array,
+                        sig_hash,
+                        matrix_active_items[
+                            min(active_len, sig_len) : max(active_len, sig_len)
+                        ],
+                        item_colorings,
+                        n_items,
+                        n_primary_items,
+                        n_colors,
+                    )
+                    sig_len = active_len
+                undo(
+                    saved_trail_top[depth],
+                    active_len,
+                    options,
+                    item_info,
+                    trail,
+                    trail_top,
+                    matrix_active_items,
+                    matrix_active_items_len,
+                    active_bits,
+                    old_active_bits,
+                )
                 need_to_undo = False
 
-            node = u(node_stack[-1].pop())  # C6
-
-            option = (
-                n_opts + u(1) if node == n_data else cover(node, item_stack[-1])
-            )  # C6 and C7
-            if option == n_opts:  # case where cover failed
-                need_to_undo = True
+            frame_left[depth] -= u(1)
+            item = item_stack[depth]
+            if item == n_items:
+                node = n_data  # n_data is the root
             else:
+                node = matrix_set[frame_start[depth] + frame_left[depth]]  # C6
+            while True:
+                if node == n_data:
+                    option = n_opts + u(1)
+                else:
+                    # C6 and C7
+                    option = cover(
+                        node,
+                        item,
+                        options,
+                        options_j,
+                        node_info,
+                        matrix_set,
+                        matrix_loc,
+                        item_info,
+                        trail,
+                        trail_top,
+                        matrix_active_items,
+                        matrix_active_items_sparse,
+                        matrix_active_items_len,
+                        active_bits,
+                        old_active_bits,
+                        primary_active_items,
+                        primary_active_items_sparse,
+                        primary_active_items_len,
+                        item_colorings,
+                        n_primary_items,
+                        n_opts,
+                    )
+                if option == n_opts:  # case where cover failed
+                    need_to_undo = True
+                    break
                 if option < n_opts:
-                    solution.append(option)  # include option in partial solution
+                    solution[depth - 1] = option  # include option in partial solution
+                slot = -1
                 if use_memo_cache:
-                    to_memo = signature(matrix_active_items_len[0])
-                if use_memo_cache and to_memo in memo_cache:
+                    # cover the items deactivated since the last signature
+                    flip_items(
+                        sig_array,
+                        sig_hash,
+                        matrix_active_items[matrix_active_items_len[0] : sig_len],
+                        item_colorings,
+                        n_items,
+                        n_primary_items,
+                        n_colors,
+                    )
+                    sig_len = matrix_active_items_len[0]
+                    slot, h = memo_find(
+                        sig_hash[0], sig_array, memo_cache, memo_signatures
+                    )
+                if slot >= 0:
                     # cache_hit +=1
-                    zdd_stack.append(memo_cache[to_memo])
-                    node_stack.append(null_list)
-                    state_stack.append(null_state)
-                    memo_stack.append(to_memo)
-                    item_stack.append(n_data)
+                    zdd_stack[depth] = memo_zdd[slot]
+                    memo_stack[depth] = slot
+                    depth += 1
+                    frame_left[depth] = 0
+                    item_stack[depth] = n_data
+                    break
+
+                # C2
+                if leftmost:
+                    item, length = choose_leftmost(
+                        item_info, active_bits, n_primary_items, n_items, n_data
+                    )
                 else:
-                    item, length = choose()  # C2
-                    zdd_stack.append(u(0))
-
-                    if use_memo_cache:
-                        memo_stack.append(to_memo)
-                    if item == n_items:
-                        # We have a solution!
-                        zdd_stack[-1] = u(1)  # Reached the true node!
-                        node_stack.append(null_list)
-                        state_stack.append(null_state)
-                        item_stack.append(item)
-
-                    else:
-                        item_stack.append(item)
-                        deactivate_item(item)  # C3
-                        matrix_old_active_items_len[0] = matrix_active_items_len[0]
-                        hide(item, 0, True)  # C4
-                        state_stack.append(
-                            null_state if length == 1 else save_state()
-                        )  # C5 (don't need to trail forced moves)
-                        node_stack.append(list(active_options(item)))
+                    item, length = choose_mrv(
+                        item_info,
+                        primary_active_items,
+                        primary_active_items_len,
+                        n_items,
+                        n_data,
+                    )
+                zdd_stack[depth] = 0
+
+                if use_memo_cache:
+                    # reserve a slot for the state, filled in when
+                    # backtracking past it (its subtree cannot revisit it)
+                    memo_signatures, memo_zdd = memo_reserve(
+                        n_memo, memo_signatures, memo_zdd
+                    )
+                    slot = n_memo
+                    n_memo += 1
+                    memo_cache[h] = slot
+                    memo_signatures[slot] = sig_array
+                    memo_zdd[slot] = 0
+                    memo_stack[depth] = slot
+                if item == n_items:
+                    # We have a solution!
+                    zdd_stack[depth] = 1  # Reached the true node!
+                    depth += 1
+                    frame_left[depth] = 0
+                    item_stack[depth] = item
+                    break
+
+                deactivate_item(
+                    item,
+                    matrix_active_items,
+                    matrix_active_items_sparse,
+                    matrix_active_items_len,
+                    active_bits,
+                    primary_active_items,
+                    primary_active_items_sparse,
+                    primary_active_items_len,
+                    n_primary_items,
+                )  # C3
+                bit_clear(old_active_bits, item)
+                hide(
+                    item,
+                    u(0),
+                    True,
+                    options,
+                    node_info,
+                    matrix_set,
+                    matrix_loc,
+                    item_info,
+                    trail,
+                    trail_top,
+                    active_bits,
+                    old_active_bits,
+                    n_primary_items,
+                )  # C4
+                depth += 1
+                item_stack[depth] = item
+                if length == 1:
+                    # a forced move: cover the only option straight away.
+                    # Its frame is still pushed, as the ZDD node is built
+                    # when backtracking through it, but with nothing left
+                    # to try there is no state to save (C5) for it
+                    frame_left[depth] = 0
+                    node = matrix_set[item_info[item, START]]
+                    continue
+
+                # push a new frame holding the active options of item
+                saved_trail_top[depth] = trail_top[0]  # C5
+                saved_active_len[depth] = matrix_active_items_len[0]
+                saved_primary_len[depth] = primary_active_items_len[0]
+                frame_start[depth] = item_info[item, START]
+                frame_left[depth] = length
+                break
     # print(f"{cache_hit} cache hits")
@@ -7,27 +7,27 @@ def read_xcover_from_file(filename):
     """
     Simple parser for files decribing exact cover problems in Knuth's format
     """
-    with open(filename, "r", encoding="utf-8") as cover_file:
-        first = True
-        options = []
-        for line in cover_file.readlines():
-            if first:
-                if (
-                    line[0] == "|" or line[0] == "/" or line == "\n"
-                ):  # a comment line, ignore
-                    continue
-                first = False
-                split_pri_sec = line.rstrip("\n").lstrip().split("|")
-                primary = split_pri_sec[0].split()
-                if len(split_pri_sec) > 1:
-                    secondary = split_pri_sec[1].split()
-                    colored = True
-                else:
-                    secondary = None
-                    colored = False
-            else:
-                splits = line.rstrip("\n").lstrip().split()
-                options.append(splits)
+    # read and decode the whole file in one go, rather than line by line
+    with open(filename, "rb") as cover_file:
+        lines = cover_file.read().decode("utf-8").splitlines()
+
+    # skip the comment lines before the line of items
+    first = 0
+    while first < len(lines) and (
+        lines[first] == "" or lines[first][0] == "|" or lines[first][0] == "/"
+    ):
+        first += 1
+
+    split_pri_sec = lines[first].split("|")
+    primary = split_pri_sec[0].split()
+    if len(split_pri_sec) > 1:
+        secondary = split_pri_sec[1].split()
+        colored = True
+    else:
+        secondary = None
+        colored = False
+
+    options = [line.split() for line in lines[first + 1 :]]
 
     return options, primary, secondary, colored
 
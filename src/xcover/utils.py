@@ -1,63 +1,117 @@
 """Some useful additional routines"""
 
+from itertools import chain
+from weakref import WeakKeyDictionary
 import numpy as np
-from .solvers import items
+from .solvers import CompiledSolver, bool_as_arrays
 
 
 def verify_exact_cover(solution, options, primary=None, secondary=None, colored=False):
     """
     Throws an exception if a solution does not represent an exact cover.
+
+    The check is made directly from the chosen options, independently of
+    the conversion to array form used by the solvers. An AssertionError
+    is raised if the solution is not an exact cover, and a ValueError if
+    the chosen options contain an item that is neither one of the given
+    primary items nor one of the given secondary items.
+
+    options may also be a CompiledSolver for the problem, in which case
+    its options are checked (and colored is taken from the solver), and
+    the items inferred for each choice of primary and secondary items are
+    kept, so that checking many solutions does not repeat the inference.
     """
-    # A single list of all the options
-    all_opts = [o for opt in options for o in opt]
+    if isinstance(options, CompiledSolver):
+        solver, colored = options, options.colored
+        options = solver.options
+        key = (
+            None if primary is None else tuple(primary),
+            None if secondary is None else tuple(secondary),
+        )
+        known = _solver_items.setdefault(solver, {})
+        if key not in known:
+            known[key] = item_indices(options, primary, secondary, colored)
+        item_index, n_primary = known[key]
+    else:
+        item_index, n_primary = item_indices(options, primary, secondary, colored)
+    n_items = len(item_index)
 
-    # Work out explicit primary and secondary item lists
-    primary, secondary = items(all_opts, primary, secondary, colored)
+    # The items and colors of all the nodes of the chosen options
+    nodes = [x for s in solution for x in options[s]]
+    if colored:
+        names = [x.partition(":")[0] for x in nodes]
+        col_to_idx = {}
+        chosen_colors = np.fromiter(
+            (
+                (
+                    col_to_idx.setdefault(x.rpartition(":")[2], len(col_to_idx) + 1)
+                    if ":" in x
+                    else 0
+                )
+                for x in nodes
+            ),
+            dtype=np.int64,
+            count=len(nodes),
+        )
+    else:
+        names = nodes
+        chosen_colors = np.zeros(len(nodes), dtype=np.int64)
+    try:
+        chosen_items = np.fromiter(
+            map(item_index.__getitem__, names), dtype=np.int64, count=len(names)
+        )
+    except KeyError as e:
+        raise ValueError(
+            f"item {e.args[0]!r} of the solution is neither primary nor secondary"
+        ) from None
 
     # Check the primary items for exact cover
-    primary_options = [o for s in solution for o in options[s] if o in primary]
-    cover = set().union(*[options[s] for s in solution])
-    primary_cover = set(primary).intersection(cover)
+    counts = np.bincount(chosen_items, minlength=n_items)
+    assert np.all(counts[:n_primary] == 1)
 
-    is_exact = len(primary_options) == len(primary_cover)
-    is_cover = primary_cover == set(primary)
-    assert is_exact
-    assert is_cover
+    # Check secondary items for covering at most once, where any number
+    # of nodes giving an item the same color count as a single one
+    secondary = chosen_items >= n_primary
+    uncolored = secondary & (chosen_colors == 0)
+    colored_nodes = secondary & (chosen_colors != 0)
+    n_colors = chosen_colors.max(initial=0) + 1
+    colorings = np.unique(
+        chosen_items[colored_nodes] * n_colors + chosen_colors[colored_nodes]
+    )
+    counts = np.bincount(chosen_items[uncolored], minlength=n_items)
+    counts += np.bincount(colorings // n_colors, minlength=n_items)
+    assert np.all(counts[n_primary:] <= 1)  # each only covered once
+
+
+# the items inferred by verify_exact_cover for each CompiledSolver
+_solver_items = WeakKeyDictionary()
 
-    # Check secondary items for covering at most once
-    if colored:
-        secondary_options = [
-            o for s in solution for o in options[s] if o.split(":")[0] in secondary
-        ]
-    else:
-        secondary_options = [o for s in solution for o in options[s] if o in secondary]
 
-    # Count occurances of each secondary item
-    counts = {s: 0 for s in secondary}
-    colors = {s: 0 for s in secondary}
-    for item in secondary_options:
+def item_indices(options, primary=None, secondary=None, colored=False):
+    """
+    Number the items of a problem for verify_exact_cover, primary items
+    first, inferring any not given from the options as the solvers do.
+    Returns the numbering and the number of primary items.
+    """
+    if primary is None or secondary is None:
         if colored:
-            itm = item.split(":")[0]
-            if len(item.split(":")) > 1:
-                col = item.split(":")[1]
-            else:
-                col = 0
+            universe = {x.partition(":")[0] for opt in options for x in opt}
         else:
-            itm, col = item, 0
-        if col != 0:
-            if colors[itm] == 0:
-                colors[itm] = col
-                counts[itm] += 1
-            elif colors[itm] != col:
-                assert False  # can't color twice
-            else:
-                continue  # fine to have another item of same color
+            universe = {x for opt in options for x in opt}
+        if primary is None and secondary is None:
+            primary, secondary = universe, []
+        elif primary is None:
+            primary = universe.difference(secondary)
         else:
-            counts[itm] += 1
-    for _, count in counts.items():
-        assert count <= 1  # each only covered once
+            secondary = universe.difference(primary)
+
+    item_index = {item: i for i, item in enumerate(chain(primary, secondary))}
+    return item_index, len(primary)
 
 
 def bool_array_to_options(bool_array):
     """Convert a boolean array into a options list of lists"""
-    return [list(np.nonzero(bool_array[i, :])[0]) for i in range(bool_array.shape[0])]
+    # one pass over the array, split up into rows at the option boundaries
+    options, options_ptr = bool_as_arrays(np.asarray(bool_array))[:2]
+    options, options_ptr = options.tolist(), options_ptr.tolist()
+    return [options[b:e] for b, e in zip(options_ptr[:-1], options_ptr[1:])]
@@ -1,5 +1,55 @@
 """Some additional routines for manipulating zdds"""
 
+import numpy as np
+
+
+def count_zdd(zdd):
+    """
+    Count the number of solutions represented by a ZDD, directly from
+    the nodes yielded by covers_zdd, without conversion to another format.
+    """
+    # The nodes are numbered consecutively from 2, children before parents,
+    # so one pass of the counting recurrence count = count(lo) + count(hi)
+    # suffices. Python integers keep the count exact.
+    _, _, lo_arr, hi_arr = (a.tolist() for a in zdd_arrays(zdd))
+    counts = [0, 1]
+    for k in range(len(lo_arr)):
+        counts.append(counts[lo_arr[k]] + counts[hi_arr[k]])
+    return counts[-1] if len(counts) > 2 else 0
+
+
+def reduce_zdd(zdd):
+    """
+    Remove duplicate nodes from a ZDD, i.e. nodes with the same item and
+    the same lo and hi children, yielding the nodes of the reduced ZDD in
+    the same (index, item, lo, hi) form with the indices renumbered.
+    """
+    # Nodes arrive children first, so each layer below a node is already
+    # reduced when it arrives and one hash-consing pass is enough
+    _, n_arr, lo_arr, hi_arr = (a.tolist() for a in zdd_arrays(zdd))
+    unique = {}
+    new_index = [0, 1]  # the terminal nodes keep their indices
+    for k in range(len(n_arr)):
+        key = (n_arr[k], new_index[lo_arr[k]], new_index[hi_arr[k]])
+        index = unique.get(key)
+        if index is None:
+            index = len(unique) + 2
+            unique[key] = index
+            yield (index,) + key
+        new_index.append(index)
+
+
+def zdd_arrays(zdd):
+    """
+    The nodes of a ZDD as four int64 columns (index, item, lo, hi), so that
+    the routines in this module walk packed arrays rather than a tuple per node.
+    Columns that are already split out are passed straight through.
+    """
+    if isinstance(zdd, tuple) and len(zdd) == 4 and isinstance(zdd[0], np.ndarray):
+        return zdd
+    z = np.array(list(zdd), dtype=np.int64).reshape(-1, 4)
+    return z[:, 0], z[:, 1], z[:, 2], z[:, 3]
+
 
 def to_zdd_algorithms(zdd):
     """
@@ -9,14 +59,16 @@ def to_zdd_algorithms(zdd):
 
     from zdd_algorithms import empty, base, get_node
 
-    nodes = [empty()]
-    done_something = False
-    for z in zdd:
-        if not done_something:
-            nodes.append(base())
-            done_something = True
-        n, lo, hi = z[1], z[2], z[3]
-        nodes.append(get_node(n, nodes[lo], nodes[hi]))
+    i_arr, n_arr, lo_arr, hi_arr = (a.tolist() for a in zdd_arrays(zdd))
+    if not i_arr:
+        return empty()
+
+    # as in to_oxidd, the list of nodes is allocated up front and filled in
+    nodes = [None] * (len(i_arr) + 2)
+    nodes[0] = empty()
+    nodes[1] = base()
+    for k in range(len(i_arr)):
+        nodes[i_arr[k]] = get_node(n_arr[k], nodes[lo_arr[k]], nodes[hi_arr[k]])
     return nodes[-1]
 
 
@@ -24,19 +76,28 @@ def to_setset(zdd, n_options):
     """
     Conversion to the ZDD format used by
     https://github.com/takemaru/graphillion
+
+    Duplicate nodes are removed before the conversion, so that graphillion
+    only has to load the reduced ZDD.
     """
 
     from graphillion import setset
 
     setset.set_universe(list(range(n_options)))
 
-    zdd_string = ""
-    for z in zdd:
-        i, n, lo, hi = z[0], 1 + z[1], z[2], z[3]
-        lo_str = "B" if lo == 0 else lo
-        hi_str = "T" if hi == 1 else hi
-        zdd_string += f"{i} {n} {lo_str} {hi_str}\n"
-    zdd_string += ".\n"
+    # the line for each node is built from the columns in one join, rather
+    # than by growing a string node by node
+    i_arr, n_arr, lo_arr, hi_arr = zdd_arrays(reduce_zdd(zdd))
+    lo_tokens = ["B" if lo == 0 else lo for lo in lo_arr.tolist()]
+    hi_tokens = ["T" if hi == 1 else hi for hi in hi_arr.tolist()]
+    lines = map(
+        "{} {} {} {}\n".format,
+        i_arr.tolist(),
+        (1 + n_arr).tolist(),
+        lo_tokens,
+        hi_tokens,
+    )
+    zdd_string = "".join(lines) + ".\n"
     return setset(setset.loads(zdd_string))
 
 
@@ -49,32 +110,51 @@ def count_setset_nodes(ss):
     ss_string = ss.dumps()
     if ss_string[0] == "B":  # an empty set just contains the single node B
         return 1
-    for i, line in enumerate(ss_string.split("\n")):
-        if line == ".":  # "." marks end of file, have this no. plus T and B
-            return i + 2
+    # the dump ends with a "." line marking the end of file, so counting the
+    # line breaks gives the lines before it plus one, add one more for T and B
+    return ss_string.count("\n") + 1
 
 
 def to_oxidd(
-    zdd, n_options, inner_node_capacity=2000000, apply_cache_size=2000000, threads=1
+    zdd, n_options, inner_node_capacity=None, apply_cache_size=None, threads=1
 ):
     """
     Conversion to the ZDD format used by
     https://github.com/OxiDD/oxidd
+
+    If not given, the inner node capacity and apply cache size of the
+    manager are sized from the number of nodes in the ZDD.
     """
 
     from oxidd.zbdd import ZBDDManager
 
+    i_arr, n_arr, lo_arr, hi_arr = (a.tolist() for a in zdd_arrays(zdd))
+    node_count = len(i_arr) + 2  # including the empty and base terminals
+    if inner_node_capacity is None:
+        inner_node_capacity = next_power_of_two(int(1.3 * node_count))
+    if apply_cache_size is None:
+        apply_cache_size = next_power_of_two(node_count)
+
     zbdd = ZBDDManager(inner_node_capacity, apply_cache_size, threads)
-    vbls = [zbdd.new_singleton() for i in range(n_options)]
+    if hasattr(zbdd, "new_singleton"):
+        vbls = [zbdd.new_singleton() for i in range(n_options)]
+    else:  # newer versions of oxidd
+        vbls = [zbdd.singleton(var) for var in zbdd.add_vars(n_options)]
+
+    if not i_arr:
+        return zbdd.empty()
+
+    # The nodes are numbered consecutively from 2, children before parents,
+    # so each node's children are always in place before it is made
+    nodes = [None] * node_count
+    nodes[0] = zbdd.empty()
+    nodes[1] = zbdd.base()
+    for k in range(len(i_arr)):
+        nodes[i_arr[k]] = vbls[n_arr[k]].make_node(nodes[hi_arr[k]], nodes[lo_arr[k]])
 
-    nodes = [zbdd.empty()]
-    done_something = False
-    for z in zdd:
-        if not done_something:
-            nodes.append(zbdd.base())
-            done_something = True
+    return nodes[-1]
 
-        n, lo, hi = z[1], z[2], z[3]
-        nodes.append(vbls[n].make_node(nodes[hi], nodes[lo]))
 
-    return nodes[-1]
+def next_power_of_two(n):
+    """The smallest power of two that is at least n (and at least 1024)"""
+    return max(1 << (n - 1).bit_length(), 1024)